@@ -1,15 +1,23 @@
 # bot.py
+import asyncio
+import cProfile
 import logging
+import multiprocessing
+import pstats
 import sqlite3
 import os
 import re
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, date, timedelta
 from dotenv import load_dotenv
 import openpyxl  # pip install openpyxl
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
-    ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler,
+    Application, ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler,
     ConversationHandler, ContextTypes, filters
 )
 
@@ -17,6 +25,8 @@ from telegram.ext import (
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_CODE = os.getenv("ADMIN_CODE", "supersecret123")
+# Test/yük testi üçün: Bot API-ni başqa serverə yönləndirmək (məs. http://127.0.0.1:8081/bot)
+BOT_API_BASE_URL = os.getenv("BOT_API_BASE_URL")
 
 if not BOT_TOKEN:
     raise RuntimeError("BOT_TOKEN tapılmadı. .env faylını yoxlayın.")
@@ -28,6 +38,7 @@ logger = logging.getLogger(__name__)
 
 DB_PATH = "database.db"
 SCHEDULE_XLSX = "schedule.xlsx"
+SCHEDULE_DIR = "schedules"  # mövcuddursa, içindəki bütün .xlsx faylları yüklənir
 
 # Conversation states
 ASK_PERSONAL_NUMBER = 1
@@ -72,7 +83,22 @@ def create_session(tg_id, student_id):
     conn.close()
 
 # ================= Schedule parsing və saxlanma (diagnostika daxil) =================
-SCHEDULE = []  # hər element: {"week_type", "group", "day_norm", "time", "subject", "teacher", "room"}
+# Yüklənmiş cədvəl və bütün indekslər bir obyektdədir və bir dəfəyə dəyişdirilir.
+# Oxuyan kod SCHEDULE_DATA-nı bir dəfə lokal dəyişənə götürməlidir ki,
+# reload zamanı köhnə və yeni indeksləri qarışdırmasın.
+#   lessons:       [lesson, ...], lesson = {"faculty", "week_type", "group", "day_norm", "time", "subject", "teacher", "room"}
+#   by_faculty:    {faculty: {group_lower: [lesson, ...]}}
+#   teachers:      {teacher_name_key: [lesson, ...]}
+#   teacher_words: {söz: {teacher_name_key, ...}}
+#   teacher_names: {teacher_name_key: cədvəldə yazıldığı kimi ad}
+#   rooms:         {room_key: {(week_type, day_norm): [lesson, ...]}}
+#   room_names:    {room_key: cədvəldə yazıldığı kimi ad}
+#   slots:         {(week_type, day_norm): {start_minutes: {room_key, ...}}}
+ScheduleData = namedtuple("ScheduleData", [
+    "lessons", "by_faculty", "teachers", "teacher_words", "teacher_names", "rooms", "room_names", "slots"
+])
+SCHEDULE_DATA = ScheduleData([], {}, {}, {}, {}, {}, {}, {})
+LESSON_MINUTES = 80  # bir dərsin (cütün) müddəti, boş otaq hesablaması üçün
 
 DAY_MAP = {
     "monday": "1", "mon": "1",
@@ -118,66 +144,85 @@ def is_alt_week():
     week_num = today.isocalendar()[1]
     return week_num % 2 != 0
 
-def load_schedule_from_xlsx(path=SCHEDULE_XLSX):
+def _detect_columns(headers):
+    """Başlıq xanalarından week/group/day/subject sütunlarını tapır."""
+    detected = {"week_col": None, "group_col": None, "day_col": None, "subject_col": None}
+    for i, h in enumerate(headers):
+        hl = h.lower()
+        if 'week' in hl:
+            detected["week_col"] = i
+        elif 'group' in hl:
+            detected["group_col"] = i
+        elif 'day' in hl:
+            detected["day_col"] = i
+        elif 'subject' in hl:
+            detected["subject_col"] = i
+    return detected
+
+def _find_header_row(rows, min_matches=2):
     """
-    Güclü diagnostika ilə schedule yükləyir.
-    Return: (ok: bool, diagnostics: dict)
+    Başlıq sətrini tapır: week/group/day/subject açar sözlərindən ən azı
+    min_matches-i ayrı xanalarda olan ilk sətir (yuxarıdakı başlıq/banner
+    sətirləri atlanır). Return: (index, headers) və ya (None, []).
     """
-    global SCHEDULE
-    SCHEDULE = []
-    diagnostics = {
+    for i, r in enumerate(rows):
+        headers = [str(c).strip() if c is not None else "" for c in r]
+        detected = _detect_columns(headers)
+        if sum(v is not None for v in detected.values()) >= min_matches:
+            return i, headers
+    return None, []
+
+def _shard_diagnostics(path, sheet_name, faculty):
+    return {
         "path": path,
-        "found_file": False,
+        "sheet": sheet_name,
+        "faculty": faculty,
+        "error": None,
         "num_rows": 0,
+        "header_row": None,
         "headers": [],
         "ncols": 0,
         "detected": {"week_col": None, "group_col": None, "day_col": None, "subject_col": None},
         "parsed_rows": []
     }
 
+def _parse_schedule_sheet(path, sheet_name, faculty):
+    """
+    Bir shard-ı (bir vərəqi) oxuyur və parse edir. Process pool-da işləyir,
+    ona görə qlobal SCHEDULE_DATA-ya toxunmur.
+    Return: (entries: list, diagnostics: dict)
+    """
+    entries = []
+    diagnostics = _shard_diagnostics(path, sheet_name, faculty)
+
     try:
-        wb = openpyxl.load_workbook(path, data_only=True)
-        diagnostics["found_file"] = True
-    except FileNotFoundError:
-        logger.error("Schedule faylı tapılmadı: %s", path)
-        return False, diagnostics
+        # read_only rejimində yalnız lazım olan vərəq oxunur
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = list(wb[sheet_name].iter_rows(values_only=True))
+        finally:
+            wb.close()
     except Exception as e:
-        logger.exception("Schedule faylı oxunarkən xəta: %s", e)
-        return False, diagnostics
+        diagnostics["error"] = str(e)
+        return entries, diagnostics
 
-    sheet = wb.active
-    rows = list(sheet.iter_rows(values_only=True))
     diagnostics["num_rows"] = len(rows)
-    if not rows or len(rows) < 2:
-        headers = [str(c) if c is not None else "" for c in (rows[0] if rows else [])]
-        diagnostics["headers"] = headers
-        diagnostics["ncols"] = len(headers)
-        logger.warning("Schedule faylı boş və ya yetərsizdir: %s", path)
-        return True, diagnostics
-
-    headers = [str(c).strip() if c is not None else "" for c in rows[0]]
+    header_idx, headers = _find_header_row(rows)
+    diagnostics["header_row"] = header_idx + 1 if header_idx is not None else None
     diagnostics["headers"] = headers
-    ncols = len(headers)
-    diagnostics["ncols"] = ncols
-
-    week_col, group_col, day_col, subject_col = None, None, None, None
-    for i, h in enumerate(headers):
-        hl = h.lower()
-        if 'week' in hl:
-            week_col = i
-        elif 'group' in hl:
-            group_col = i
-        elif 'day' in hl:
-            day_col = i
-        elif 'subject' in hl:
-            subject_col = i
-    
-    diagnostics["detected"]["week_col"] = week_col
-    diagnostics["detected"]["group_col"] = group_col
-    diagnostics["detected"]["day_col"] = day_col
-    diagnostics["detected"]["subject_col"] = subject_col
-
-    for idx, r in enumerate(rows[1:], start=2):
+    diagnostics["ncols"] = len(headers)
+    if header_idx is None:
+        if rows:
+            diagnostics["error"] = "header row not found (week/group/day/subject)"
+        return entries, diagnostics
+
+    diagnostics["detected"] = _detect_columns(headers)
+    week_col = diagnostics["detected"]["week_col"]
+    group_col = diagnostics["detected"]["group_col"]
+    day_col = diagnostics["detected"]["day_col"]
+    subject_col = diagnostics["detected"]["subject_col"]
+
+    for idx, r in enumerate(rows[header_idx + 1:], start=header_idx + 2):
         def cell_at(i):
             return r[i] if i < len(r) and r[i] is not None else ""
 
@@ -198,9 +243,6 @@ def load_schedule_from_xlsx(path=SCHEDULE_XLSX):
 
         day_norm = normalize_day_to_english(day_raw)
         
-        # Subject sütunundakı məlumatları ayırmaq
-        match = re.match(r'^(?:\d+\))?\s*(.*?)(?:\s+-\s+(.*?))?(?:\s+\((.*?)\))?$', subject_raw)
-        
         subject = ""
         teacher = ""
         time_str = ""
@@ -215,7 +257,7 @@ def load_schedule_from_xlsx(path=SCHEDULE_XLSX):
                 room = room_match_text.strip()
         
         # Mətndə fənnin adını və müəllimi tapmaq üçün
-        subject_teacher_match = re.match(r'^(?:\d+\))?\s*(.*?)(?:\s+\(.*?\))?\s+-\s+(.*?)\s+', subject_raw)
+        subject_teacher_match = re.match(r'^(?:\d+\))?\s*(.*?)(?:\s+\(.*?\))?\s+-\s+(.*?)\s*\(\d{1,2}:\d{2}', subject_raw)
         if subject_teacher_match:
             subject = subject_teacher_match.group(1).strip()
             teacher = subject_teacher_match.group(2).strip()
@@ -237,6 +279,7 @@ def load_schedule_from_xlsx(path=SCHEDULE_XLSX):
             continue
 
         entry = {
+            "faculty": faculty,
             "week_type": week_type,
             "group": group.strip(),
             "day": day_raw.strip(),
@@ -246,7 +289,7 @@ def load_schedule_from_xlsx(path=SCHEDULE_XLSX):
             "teacher": teacher,
             "room": room
         }
-        SCHEDULE.append(entry)
+        entries.append(entry)
         diagnostics["parsed_rows"].append({
             "row_index": idx,
             "raw": [str(x) if x is not None else "" for x in r],
@@ -254,7 +297,159 @@ def load_schedule_from_xlsx(path=SCHEDULE_XLSX):
             "parsed": entry
         })
 
-    logger.info("Schedule yükləndi: %d sətir.", len(SCHEDULE))
+    return entries, diagnostics
+
+def _list_schedule_shards(path):
+    """
+    Yüklənəcək shard-ların siyahısı: [(file_path, sheet_name, faculty), ...].
+    Açıla bilməyən fayllar ayrıca qaytarılır (shard diagnostikası kimi), qalanlar yüklənir.
+    path qovluqdursa, içindəki bütün .xlsx faylları; hər vərəq ayrı shard-dır.
+    Fakültə adı: tək fayl üçün vərəq adı, qovluq üçün fayl adı (çox vərəq varsa "fayl/vərəq").
+    """
+    if os.path.isdir(path):
+        files = sorted(
+            os.path.join(path, f) for f in os.listdir(path)
+            if f.lower().endswith(".xlsx") and not f.startswith("~$")
+        )
+    else:
+        files = [path]
+
+    shards, failed = [], []
+    for fp in files:
+        stem = os.path.splitext(os.path.basename(fp))[0]
+        try:
+            wb = openpyxl.load_workbook(fp, read_only=True)
+            try:
+                sheet_names = list(wb.sheetnames)
+            finally:
+                wb.close()
+        except Exception as e:
+            shard_diag = _shard_diagnostics(fp, None, stem)
+            shard_diag["error"] = str(e)
+            failed.append(shard_diag)
+            continue
+        for sn in sheet_names:
+            if fp == path:
+                faculty = sn
+            elif len(sheet_names) > 1:
+                faculty = f"{stem}/{sn}"
+            else:
+                faculty = stem
+            shards.append((fp, sn, faculty))
+    return shards, failed
+
+def _time_to_minutes(s):
+    m = re.match(r'(\d{1,2}):(\d{2})', s or "")
+    return int(m.group(1)) * 60 + int(m.group(2)) if m else None
+
+def _room_label(raw):
+    """'otaq 05KM' -> '05KM' (hərflər cədvəldəki kimi saxlanılır)"""
+    return re.sub(r'^otaq\s*', '', str(raw or "").strip(), flags=re.IGNORECASE).strip()
+
+def _room_key(raw):
+    """'otaq 05KM' / 'Otaq 05km' / '05KM' -> '05km'"""
+    return _room_label(raw).lower()
+
+def _name_key(s):
+    """
+    Ad axtarışı üçün açar: kiçik hərf, 'İ'.lower()-in verdiyi birləşən nöqtə
+    silinir, 'ı' -> 'i' (böyük 'I' Python-da 'i' olur).
+    """
+    return re.sub(r'\s+', ' ', str(s or "").lower().replace("\u0307", "").replace("ı", "i")).strip()
+
+def _build_schedule_data(schedule, by_faculty):
+    """Müəllim və otaq üzrə inverted indeksləri qurur (sahələr ScheduleData-da)."""
+    teachers, teacher_words, teacher_names = {}, {}, {}
+    room_index, slot_index, room_names = {}, {}, {}
+    for e in schedule:
+        if e["teacher"]:
+            key = _name_key(e["teacher"])
+            if key not in teachers:
+                teacher_names[key] = e["teacher"]
+                for w in key.split():
+                    teacher_words.setdefault(w, set()).add(key)
+            teachers.setdefault(key, []).append(e)
+        room = _room_key(e["room"])
+        if not room:
+            continue
+        room_names.setdefault(room, _room_label(e["room"]))
+        wd = (e["week_type"], e["day_norm"])
+        room_index.setdefault(room, {}).setdefault(wd, []).append(e)
+        start = _time_to_minutes(e["time"])
+        if start is not None:
+            slot_index.setdefault(wd, {}).setdefault(start, set()).add(room)
+    return ScheduleData(schedule, by_faculty, teachers, teacher_words, teacher_names,
+                        room_index, room_names, slot_index)
+
+def load_schedule_from_xlsx(path=None):
+    """
+    Güclü diagnostika ilə schedule yükləyir. Hər vərəq (və ya qovluqdakı hər
+    workbook) ayrı shard kimi process pool-da parse olunur, nəticələr
+    fakültə/qrup üzrə SCHEDULE_DATA.by_faculty-də birləşdirilir. Müəllim/otaq
+    indeksləri də burada yenidən qurulur.
+    Return: (ok: bool, diagnostics: dict)
+    """
+    global SCHEDULE_DATA
+    if path is None:
+        path = SCHEDULE_DIR if os.path.isdir(SCHEDULE_DIR) else SCHEDULE_XLSX
+    diagnostics = {
+        "path": path,
+        "found_file": False,
+        "num_rows": 0,
+        "shards": []
+    }
+
+    if not os.path.exists(path):
+        logger.error("Schedule faylı tapılmadı: %s", path)
+        return False, diagnostics
+
+    try:
+        shards, failed = _list_schedule_shards(path)
+        diagnostics["found_file"] = bool(shards or failed)
+    except Exception as e:
+        logger.exception("Schedule faylı oxunarkən xəta: %s", e)
+        return False, diagnostics
+
+    if not shards:
+        for shard_diag in failed:
+            diagnostics["shards"].append(shard_diag)
+            logger.error("Schedule faylı oxunmadı: %s: %s", shard_diag["path"], shard_diag["error"])
+        if not failed:
+            logger.error("Schedule faylı tapılmadı: %s", path)
+        return False, diagnostics
+
+    try:
+        if len(shards) == 1:
+            results = [_parse_schedule_sheet(*shards[0])]
+        else:
+            workers = min(len(shards), os.cpu_count() or 1)
+            # Yükləmə executor thread-indən çağırılır; çox-thread-li prosesdə fork təhlükəlidir
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method)) as pool:
+                results = list(pool.map(_parse_schedule_sheet, *zip(*shards)))
+    except Exception as e:
+        # BrokenProcessPool, pickling xətası və s. — köhnə cədvəl qüvvədə qalır
+        logger.exception("Schedule shard-ları parse olunarkən xəta: %s", e)
+        return False, diagnostics
+    results += [([], shard_diag) for shard_diag in failed]
+
+    schedule = []
+    index = {}
+    for entries, shard_diag in results:
+        diagnostics["shards"].append(shard_diag)
+        diagnostics["num_rows"] += shard_diag["num_rows"]
+        if shard_diag["error"]:
+            logger.warning("Shard oxunmadı: %s [%s]: %s", shard_diag["path"], shard_diag["sheet"], shard_diag["error"])
+        elif shard_diag["num_rows"] < 2:
+            logger.warning("Schedule vərəqi boş və ya yetərsizdir: %s [%s]", shard_diag["path"], shard_diag["sheet"])
+        for e in entries:
+            schedule.append(e)
+            groups = index.setdefault(e["faculty"], {})
+            groups.setdefault(e["group"].lower(), []).append(e)
+
+    # Tək təyinat: handler-lər ya köhnə, ya da tam yeni cədvəli görür
+    SCHEDULE_DATA = _build_schedule_data(schedule, index)
+    logger.info("Schedule yükləndi: %d sətir, %d shard.", len(schedule), len(results))
     return True, diagnostics
 
 def get_lessons_filtered(group=None, day=None, subject=None, week_type=None):
@@ -264,15 +459,21 @@ def get_lessons_filtered(group=None, day=None, subject=None, week_type=None):
         current_week_is_alt = is_alt_week()
         week_type = "alt" if current_week_is_alt else "ust"
 
-    for l in SCHEDULE:
+    data = SCHEDULE_DATA
+    if group:
+        # Qrup verilibsə, bütün cədvəli yox, yalnız həmin qrupun bölməsini gəzirik
+        g = group.strip().lower()
+        candidates = [l for groups in data.by_faculty.values() for l in groups.get(g, [])]
+    else:
+        candidates = data.lessons
+
+    rd = normalize_day_to_english(day).strip().lower() if day else None
+    for l in candidates:
         if l['week_type'].lower() != week_type.lower():
             continue
-        if group and l['group'].strip().lower() != group.strip().lower():
-            continue
-        if day:
-            rd = normalize_day_to_english(day)
+        if rd is not None:
             dn = l.get("day_norm","")
-            if dn.strip().lower() != rd.strip().lower():
+            if dn.strip().lower() != rd:
                 continue
         if subject and subject.strip().lower() not in l.get('subject','').strip().lower():
             continue
@@ -283,6 +484,62 @@ def get_lessons_filtered(group=None, day=None, subject=None, week_type=None):
                              int(re.match(r'(\d{1,2}):(\d{2})', x.get('time','')).group(2)))) or 0)
     return res
 
+def _current_week_type():
+    return "alt" if is_alt_week() else "ust"
+
+def _sort_lessons(lessons):
+    return sorted(lessons, key=lambda x: (x.get("day_norm", ""), _time_to_minutes(x.get("time")) or 0))
+
+def get_teacher_lessons(name, week_type=None):
+    """
+    Müəllimin dərsləri. Sorğudakı bütün sözlər adda tam söz kimi olmalıdır,
+    sıra fərq etmir: "Eyyubov" və "Ramazan Eyyubov" -> "Eyyubov Ramazan".
+    Return: (uyğun gələn müəllim adları, dərslər)
+    """
+    data = SCHEDULE_DATA
+    week_type = (week_type or _current_week_type()).lower()
+    words = _name_key(name).split()
+    if not words:
+        return [], []
+    keys = set.intersection(*(data.teacher_words.get(w, set()) for w in words))
+    lessons = [l for k in keys for l in data.teachers[k] if l["week_type"].lower() == week_type]
+    return sorted(data.teacher_names[k] for k in keys), _sort_lessons(lessons)
+
+def get_room_lessons(room, week_type=None):
+    """Return: (otağın adı və ya None, dərslər)"""
+    data = SCHEDULE_DATA
+    week_type = (week_type or _current_week_type()).lower()
+    key = _room_key(room)
+    if key not in data.rooms:
+        return None, []
+    by_slot = data.rooms[key]
+    lessons = [l for (wt, _), ls in by_slot.items() if wt == week_type for l in ls]
+    return data.room_names[key], _sort_lessons(lessons)
+
+def get_free_rooms(day, time_str, week_type=None):
+    """
+    Verilən gün/vaxtda boş olan otaqlar. Yalnız həmin gün üçün dərs başlama
+    vaxtlarına baxılır; dərs LESSON_MINUTES davam edir.
+    Return: None (gün 1-7 deyilsə və ya vaxt 00:00-23:59 deyilsə) və ya
+    otaq adlarının sorted list-i.
+    """
+    data = SCHEDULE_DATA
+    week_type = (week_type or _current_week_type()).lower()
+    day_norm = normalize_day_to_english(day)
+    m = re.fullmatch(r'(\d{1,2}):(\d{2})', (time_str or "").strip())
+    if day_norm not in ("1", "2", "3", "4", "5", "6", "7") or not m:
+        return None
+    hh, mm = int(m.group(1)), int(m.group(2))
+    if hh > 23 or mm > 59:
+        return None
+    t = hh * 60 + mm
+    starts = data.slots.get((week_type, day_norm), {})
+    busy = set()
+    for start, rooms in starts.items():
+        if start <= t < start + LESSON_MINUTES:
+            busy |= rooms
+    return [data.room_names[r] for r in sorted(data.rooms) if r not in busy]
+
 # ================= Bot əmrləri və axınları =================
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.clear()
@@ -573,50 +830,310 @@ async def schedule_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         lines.append(f"{ls.get('day_norm') or ls.get('day','—')} ({ls.get('week_type','—')}) {ls.get('time','—')} — {ls.get('subject','—')}")
     await update.message.reply_text("\n".join(lines))
 
+def _split_week_arg(args):
+    """Sonuncu arqument alt/ust-dursa, onu ayırır."""
+    if args and args[-1].lower() in ["alt", "ust"]:
+        return args[:-1], args[-1].lower()
+    return args, None
+
+def _lesson_line(ls):
+    teacher_str = f"({ls['teacher']})" if ls.get('teacher') else ""
+    room_str = f"[otaq {_room_label(ls['room'])}]" if ls.get('room') else ""
+    return f"{ls.get('day_norm','—')} {ls.get('time','—')} — {ls.get('subject','—')}, {ls.get('group','—')} {teacher_str} {room_str}".strip()
+
+async def teacher_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    args, week_type = _split_week_arg(context.args)
+    if not args:
+        await update.message.reply_text("İstifadə: /teacher <ad> [alt|ust]\nMəsələn: /teacher Əliyev alt")
+        return
+    name = " ".join(args)
+    teachers, lessons = get_teacher_lessons(name, week_type)
+    if not lessons:
+        await update.message.reply_text("Bu müəllim üçün dərs tapılmadı.")
+        return
+
+    week_type = week_type or _current_week_type()
+    lines = [f"Müəllim — {', '.join(teachers)}, {week_type.capitalize()} həftə:"]
+    lines += [_lesson_line(ls) for ls in lessons]
+    for c in _chunk_text("\n".join(lines)):
+        await update.message.reply_text(c)
+
+async def room_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    args, week_type = _split_week_arg(context.args)
+    if not args:
+        await update.message.reply_text("İstifadə: /room <otaq> [alt|ust]\nMəsələn: /room 305 ust")
+        return
+    room_name, lessons = get_room_lessons(" ".join(args), week_type)
+    if room_name is None:
+        await update.message.reply_text("Belə otaq cədvəldə yoxdur.")
+        return
+
+    week_type = week_type or _current_week_type()
+    if not lessons:
+        await update.message.reply_text(f"Otaq {room_name} — {week_type.capitalize()} həftə ərzində boşdur.")
+        return
+    lines = [f"Otaq {room_name} — {week_type.capitalize()} həftə:"]
+    lines += [_lesson_line(ls) for ls in lessons]
+    for c in _chunk_text("\n".join(lines)):
+        await update.message.reply_text(c)
+
+async def freerooms_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    args, week_type = _split_week_arg(context.args)
+    if len(args) < 2:
+        await update.message.reply_text("İstifadə: /freerooms <day> <time> [alt|ust]\nMəsələn: /freerooms 3 11:40 alt")
+        return
+    day, time_str = " ".join(args[:-1]), args[-1]
+    rooms = get_free_rooms(day, time_str, week_type)
+    if rooms is None:
+        await update.message.reply_text(
+            "Gün (1-7) və ya vaxt (00:00-23:59) düzgün deyil.\n"
+            "İstifadə: /freerooms <day> <time> [alt|ust]\nMəsələn: /freerooms 3 11:40 alt"
+        )
+        return
+
+    week_type = week_type or _current_week_type()
+    header = f"Boş otaqlar — gün {normalize_day_to_english(day)}, {time_str}, {week_type.capitalize()} həftə"
+    if not rooms:
+        await update.message.reply_text(header + ": boş otaq yoxdur.")
+        return
+    for c in _chunk_text(f"{header} ({len(rooms)}):\n" + ", ".join(rooms)):
+        await update.message.reply_text(c)
+
 async def reload_schedule_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    ok, diag = load_schedule_from_xlsx()
+    # Yükləmə (process pool daxil) event loop-u bloklamasın
+    ok, diag = await asyncio.get_running_loop().run_in_executor(None, load_schedule_from_xlsx)
     if not ok:
         await update.message.reply_text("Schedule faylı tapılmadı və ya oxunmadı. Serverdə faylın adını və yerini yoxlayın.")
         return
-    await update.message.reply_text(f"Cədvəl yükləndi. {len(SCHEDULE)} sətir parse olundu.")
+    await update.message.reply_text(f"Cədvəl yükləndi. {len(SCHEDULE_DATA.lessons)} sətir parse olundu ({len(diag['shards'])} shard).")
 
 # Shows diagnostics and first parsed rows
 def _chunk_text(s, limit=3900):
     return [s[i:i+limit] for i in range(0, len(s), limit)]
 
 async def showschedule_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    ok, diag = load_schedule_from_xlsx()
+    # Yükləmə (process pool daxil) event loop-u bloklamasın
+    ok, diag = await asyncio.get_running_loop().run_in_executor(None, load_schedule_from_xlsx)
     if not ok:
         await update.message.reply_text("Schedule faylı tapılmadı və ya oxunmadı. Bot serverində faylın adını və mövcudluğunu yoxla.")
         return
+    data = SCHEDULE_DATA
     parts = []
-    parts.append(f"Schedule faylı: {diag['path']}")
-    parts.append(f"Rows (including header): {diag['num_rows']}")
-    parts.append(f"Ncols: {diag['ncols']}")
-    parts.append("Headers: " + ", ".join([h or "<empty>" for h in diag["headers"]]))
-    parts.append("Detected cols: week=%s, group=%s, day=%s, subject=%s" % (
-        diag["detected"]["week_col"], diag["detected"]["group_col"],
-        diag["detected"]["day_col"], diag["detected"]["subject_col"]
-    ))
-    
-    parts.append("Parsed (first 20) rows summary:")
-    for pr in diag["parsed_rows"][:20]:
-        if pr.get("skipped"):
-            parts.append(f"  row {pr['row_index']}: SKIPPED reason={pr['reason']} raw={pr['raw']}")
-        else:
-            p = pr["parsed"]
-            parts.append(f"  row {pr['row_index']}: week={p['week_type']} group={p['group']} day={p['day_norm']} time={p['time']} subject={p['subject']}")
-    grp_counts = {}
-    for e in SCHEDULE:
-        g = e['group'].strip()
-        grp_counts[g] = grp_counts.get(g, 0) + 1
-    parts.append("Group counts: " + (", ".join(f"{k}={v}" for k,v in grp_counts.items()) if grp_counts else "No parsed lessons"))
+    parts.append(f"Schedule mənbəyi: {diag['path']}")
+    parts.append(f"Shards: {len(diag['shards'])}, rows (including headers): {diag['num_rows']}")
+    for sd in diag["shards"]:
+        parts.append(f"\n[{sd['faculty']}] {os.path.basename(sd['path'])} / {sd['sheet'] or '—'}")
+        if sd["error"]:
+            parts.append(f"  ERROR: {sd['error']}")
+            continue
+        parts.append(f"  Rows: {sd['num_rows']}, header row: {sd['header_row']}, ncols: {sd['ncols']}")
+        parts.append("  Headers: " + ", ".join([h or "<empty>" for h in sd["headers"]]))
+        parts.append("  Detected cols: week=%s, group=%s, day=%s, subject=%s" % (
+            sd["detected"]["week_col"], sd["detected"]["group_col"],
+            sd["detected"]["day_col"], sd["detected"]["subject_col"]
+        ))
+
+        parts.append("  Parsed (first 20) rows summary:")
+        for pr in sd["parsed_rows"][:20]:
+            if pr.get("skipped"):
+                parts.append(f"    row {pr['row_index']}: SKIPPED reason={pr['reason']} raw={pr['raw']}")
+            else:
+                p = pr["parsed"]
+                parts.append(f"    row {pr['row_index']}: week={p['week_type']} group={p['group']} day={p['day_norm']} time={p['time']} subject={p['subject']}")
+        groups = data.by_faculty.get(sd["faculty"], {})
+        grp_counts = {}
+        for lessons in groups.values():
+            for e in lessons:
+                g = e['group'].strip()
+                grp_counts[g] = grp_counts.get(g, 0) + 1
+        parts.append("  Group counts: " + (", ".join(f"{k}={v}" for k,v in grp_counts.items()) if grp_counts else "No parsed lessons"))
 
     text = "\n".join(parts)
     chunks = _chunk_text(text)
     for c in chunks:
         await update.message.reply_text(c)
 
+# ================= Profiling (admin /profile) =================
+PROFILE_DEFAULT_SECONDS = 30
+PROFILE_MAX_SECONDS = 600  # update sayı ilə rejimdə belə bundan uzun işləmir
+
+class HandlerProfiler:
+    """
+    Handler-lərin icrasını qısa müddət cProfile ilə ölçür. Söndürülü olanda
+    hər update üçün yalnız bir `active` yoxlaması edilir.
+    """
+    def __init__(self):
+        self.active = False
+        self.session = 0
+        self.profile = None
+        self.chat_id = None
+        self.deadline = None
+        self.max_updates = None
+        self.every = 1
+        self.seen = 0
+        self.profiled = 0
+        self.started_at = None
+        self.timer = None  # loop.call_later handle; Application.stop() onu gözləmir
+
+    def start(self, chat_id, seconds, max_updates=None, every=1):
+        self.session += 1
+        self.profile = cProfile.Profile()
+        self.chat_id = chat_id
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + seconds
+        self.max_updates = max_updates
+        self.every = max(1, every)
+        self.seen = 0
+        self.profiled = 0
+        self.active = True
+        return self.session
+
+    def should_profile(self):
+        """Hər `every`-ci update-i seçir (sampling)."""
+        self.seen += 1
+        return (self.seen - 1) % self.every == 0 and time.monotonic() < self.deadline
+
+    def done(self):
+        if time.monotonic() >= self.deadline:
+            return True
+        return self.max_updates is not None and self.profiled >= self.max_updates
+
+    def stop(self):
+        self.active = False
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        return self.profile
+
+PROFILER = HandlerProfiler()
+
+class ProfilingApplication(Application):
+    async def process_update(self, update):
+        if not PROFILER.active or not PROFILER.should_profile():
+            return await super().process_update(update)
+        PROFILER.profile.enable()
+        try:
+            await super().process_update(update)
+        finally:
+            PROFILER.profile.disable()
+            PROFILER.profiled += 1
+            if PROFILER.done():
+                self.create_task(send_profile_report(self.bot, PROFILER.session))
+
+def _is_io_wait(filename, func):
+    """
+    Event loop, selector və socket gözləmələri. cProfile await-lər arasında da
+    işlədiyi üçün bunlar own time siyahısını (regex/SQLite/render əvəzinə) doldurur.
+    """
+    path = filename.replace("\\", "/")
+    if "/asyncio/" in path or os.path.basename(path) in ("selectors.py", "selector_events.py"):
+        return True
+    if filename == "~":
+        return any(w in func for w in ("'poll'", "'select'", "'epoll'", "'kqueue'", "'control'", "socket", "ssl"))
+    return False
+
+def _profile_summary(profile, limit=15):
+    stats = pstats.Stats(profile)
+    rows = []
+    for (filename, lineno, func), (cc, nc, tt, ct, callers) in stats.stats.items():
+        rows.append((os.path.basename(filename), lineno, func, nc, tt, ct, _is_io_wait(filename, func)))
+
+    def fmt(r):
+        where = f"{r[0]}:{r[1]}" if r[0] != "~" else "built-in"
+        return f"{r[5]*1000:9.1f}ms cum {r[4]*1000:9.1f}ms own {r[3]:7d}x  {r[2]} ({where})"
+
+    own_file = os.path.basename(__file__)
+    bot_rows = sorted((r for r in rows if r[0] == own_file), key=lambda r: r[5], reverse=True)
+    hot_rows = sorted((r for r in rows if not r[6]), key=lambda r: r[4], reverse=True)
+    io_wait = sum(r[4] for r in rows if r[6])
+
+    lines = [f"Bot funksiyaları (cumulative, wall-clock — await zamanı I/O gözləməsi daxil, top {limit}):"]
+    lines += [fmt(r) for r in bot_rows[:limit]] or ["  —"]
+    lines.append(f"\nƏn çox vaxt aparan funksiyalar (own time, asyncio/selector/poll xaric, top {limit}):")
+    lines += [fmt(r) for r in hot_rows[:limit]] or ["  —"]
+    lines.append(f"\nEvent loop/I/O gözləməsi (siyahıdan çıxarılıb): {io_wait*1000:.1f}ms")
+    return "\n".join(lines)
+
+async def send_profile_report(bot, session):
+    # Köhnə timer və ya təkrar çağırış nəticəni iki dəfə göndərməsin
+    if not PROFILER.active or PROFILER.session != session:
+        return
+    profile = PROFILER.stop()
+    elapsed = time.monotonic() - PROFILER.started_at
+    header = (f"Profiling bitdi: {elapsed:.1f}s, {PROFILER.profiled} update ölçüldü "
+              f"({PROFILER.seen} update gəldi, hər {PROFILER.every}-dən biri).\n\n")
+    if not PROFILER.profiled:
+        await bot.send_message(PROFILER.chat_id, header + "Heç bir update ölçülmədi.")
+        return
+
+    for c in _chunk_text(header + _profile_summary(profile)):
+        await bot.send_message(PROFILER.chat_id, c)
+
+    fd, path = tempfile.mkstemp(suffix=".prof")
+    os.close(fd)
+    try:
+        profile.dump_stats(path)
+        with open(path, "rb") as f:
+            await bot.send_document(
+                PROFILER.chat_id, document=f,
+                filename=f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.prof",
+                caption="python -m pstats və ya snakeviz ilə açın."
+            )
+    finally:
+        os.remove(path)
+
+def _on_profile_timeout(application, session):
+    application.create_task(send_profile_report(application.bot, session))
+
+async def profile_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    args = context.args
+    if not args:
+        await update.message.reply_text(
+            "İstifadə: /profile ADMIN_CODE [60s | 200u | stop] [every]\n"
+            "60s — 60 saniyə, 200u — 200 update, every — hər N-ci update-i ölç.\n"
+            "Məsələn: /profile ADMIN_CODE 200u 5"
+        )
+        return
+
+    if args[0] != ADMIN_CODE:
+        await update.message.reply_text("Yanlış admin kodu.")
+        return
+
+    spec = args[1].lower() if len(args) >= 2 else f"{PROFILE_DEFAULT_SECONDS}s"
+    if spec == "stop":
+        if not PROFILER.active:
+            await update.message.reply_text("Profiling aktiv deyil.")
+            return
+        # Hesabatı bu update-in profilingi bağlandıqdan sonra göndəririk
+        PROFILER.deadline = time.monotonic()
+        context.application.create_task(send_profile_report(context.bot, PROFILER.session))
+        return
+
+    if PROFILER.active:
+        await update.message.reply_text("Profiling artıq gedir. Dayandırmaq üçün: /profile ADMIN_CODE stop")
+        return
+
+    m = re.fullmatch(r'(\d+)([su]?)', spec)
+    every = args[2] if len(args) >= 3 else "1"
+    if not m or not every.isdigit() or int(m.group(1)) <= 0:
+        await update.message.reply_text("Yanlış parametr. Məsələn: /profile ADMIN_CODE 60s və ya /profile ADMIN_CODE 200u")
+        return
+
+    n = int(m.group(1))
+    if m.group(2) == "u":
+        seconds, max_updates = PROFILE_MAX_SECONDS, n
+        what = f"{n} update (maks. {PROFILE_MAX_SECONDS}s)"
+    else:
+        seconds, max_updates = min(n, PROFILE_MAX_SECONDS), None
+        what = f"{seconds} saniyə"
+
+    session = PROFILER.start(update.effective_chat.id, seconds, max_updates=max_updates, every=int(every))
+    # create_task + sleep istifadə etmirik: Application.stop() izlənən task-ları gözləyir
+    PROFILER.timer = asyncio.get_running_loop().call_later(
+        seconds, _on_profile_timeout, context.application, session
+    )
+    await update.message.reply_text(f"Profiling başladı: {what}, hər {PROFILER.every}-dən bir update.")
+
 async def unknown(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message:
         await update.message.reply_text("Bağışlayın, bu əmri tanımıram. /start və ya /menu istifadə edin.")
@@ -629,17 +1146,22 @@ async def generic_text_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         return await change_code_received(update, context)
     await update.message.reply_text("Mesaj alındı. /menu və ya /start istifadə edin.")
 
+ERROR_REPLY = "Botda xəta baş verdi. Zəhmət olmasa bir az sonra yenidən cəhd edin."
+
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.exception("Unhandled exception: %s", context.error)
     try:
         if isinstance(update, Update) and update.effective_message:
-            await update.effective_message.reply_text("Botda xəta baş verdi. Zəhmət olmasa bir az sonra yenidən cəhd edin.")
+            await update.effective_message.reply_text(ERROR_REPLY)
     except Exception:
         logger.exception("Error while sending error message to user")
 
 # ================= Main =================
-def main():
-    application = ApplicationBuilder().token(BOT_TOKEN).build()
+def build_application(token=BOT_TOKEN, base_url=BOT_API_BASE_URL):
+    builder = ApplicationBuilder().token(token).application_class(ProfilingApplication)
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
 
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
@@ -657,17 +1179,25 @@ def main():
     application.add_handler(CallbackQueryHandler(button_handler))
     application.add_handler(CommandHandler("addstudent", addstudent_cmd))
     application.add_handler(CommandHandler("schedule", schedule_cmd))
+    application.add_handler(CommandHandler("teacher", teacher_cmd))
+    application.add_handler(CommandHandler("room", room_cmd))
+    application.add_handler(CommandHandler("freerooms", freerooms_cmd))
     application.add_handler(CommandHandler("reloadschedule", reload_schedule_cmd))
     application.add_handler(CommandHandler("showschedule", showschedule_cmd))
+    application.add_handler(CommandHandler("profile", profile_cmd))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, generic_text_handler))
     application.add_handler(MessageHandler(filters.COMMAND, unknown))
 
     application.add_error_handler(error_handler)
+    return application
+
+def main():
+    application = build_application()
 
     # startup: cədvəl yüklə və log göstər
     ok, diag = load_schedule_from_xlsx()
     if ok:
-        logger.info("Startup: schedule loaded, parsed rows = %d", len(SCHEDULE))
+        logger.info("Startup: schedule loaded, parsed rows = %d", len(SCHEDULE_DATA.lessons))
     else:
         logger.warning("Startup: schedule not loaded or file missing.")
 
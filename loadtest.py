@@ -0,0 +1,406 @@
+# loadtest.py
+"""
+Yük testi: lokal saxta Telegram Bot API serveri qaldırır, botu ona yönləndirir
+(BOT_API_BASE_URL) və minlərlə istifadəçinin ssenarilərini oynadır:
+/start -> nömrə -> kod -> /menu -> cədvəl düymələri.
+
+İstifadə:
+    python loadtest.py --users 2000 --mix full=0.7,browse=0.3 --ramp 10
+    python loadtest.py --users 500 --db-writers 2   # DB lock contention üçün
+
+Hesabat: throughput, addım üzrə p50/p95/p99 gecikmə və SQLite kilid statistikası.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qsl
+
+TOKEN = "123456:LOADTEST"
+os.environ.setdefault("BOT_TOKEN", TOKEN)
+
+import bot  # noqa: E402  (BOT_TOKEN mühitdə olmalıdır)
+import init_db  # noqa: E402
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "LoadTest", "username": "loadtest_bot"}
+USER_ID_BASE = 100000
+USER_CODE = "1234"
+
+# Ssenarilər: (növ, dəyər). "phone" və "code" hər istifadəçi üçün əvəz olunur.
+LOGIN = [("text", "/start"), ("text", "phone"), ("text", "code")]
+BROWSE = [("text", "/menu"), ("callback", "schedule_menu"), ("callback", "sched_today"),
+          ("callback", "sched_tomorrow"), ("callback", "sched_week")]
+SCENARIOS = {
+    "login": LOGIN,
+    "full": LOGIN + BROWSE,
+    "browse": BROWSE,
+}
+
+# ================= Statistika =================
+def percentile(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    k = max(0, math.ceil(p / 100 * len(sorted_vals)) - 1)
+    return sorted_vals[k]
+
+class DbStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reads = []
+        self.writes = []  # yazma əmrləri + commit
+        self.locked_errors = 0
+
+    def record(self, kind, elapsed):
+        with self.lock:
+            (self.writes if kind == "write" else self.reads).append(elapsed)
+
+DB_STATS = DbStats()
+
+class _TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, params=()):
+        kind = "read" if sql.lstrip().upper().startswith("SELECT") else "write"
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e):
+                DB_STATS.locked_errors += 1
+            raise
+        finally:
+            DB_STATS.record(kind, time.perf_counter() - t0)
+
+class _TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def commit(self):
+        t0 = time.perf_counter()
+        try:
+            return super().commit()
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e):
+                DB_STATS.locked_errors += 1
+            raise
+        finally:
+            DB_STATS.record("write", time.perf_counter() - t0)
+
+def instrument_db(db_path):
+    """bot.db_connect-i kilid/gözləmə vaxtını ölçən versiya ilə əvəz edir."""
+    def db_connect():
+        conn = sqlite3.connect(db_path, factory=_TimedConnection)
+        conn.row_factory = sqlite3.Row
+        return conn
+    bot.DB_PATH = db_path
+    bot.db_connect = db_connect
+
+def prepare_db(path, n_users, group):
+    """Test üçün ayrıca DB yaradır və n_users tələbə əlavə edir."""
+    init_db.DB_PATH = path
+    init_db.init_db()
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO students (tg_id, personal_number, full_name, group_name, code) VALUES (?, ?, ?, ?, ?)",
+        [(USER_ID_BASE + i, "+99450%07d" % i, f"Test User {i}", group, USER_CODE) for i in range(n_users)]
+    )
+    conn.commit()
+    conn.close()
+
+def db_writer(path, n_users, hold, stop):
+    """Kənar yazıcı (admin əmrləri, idxal və s.) — yazma kilidini qısa müddət saxlayır."""
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    while not stop.is_set():
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("UPDATE students SET full_name = full_name WHERE id = ?", (random.randint(1, n_users),))
+        time.sleep(hold)
+        conn.execute("COMMIT")
+        time.sleep(hold)
+    conn.close()
+
+# ================= Saxta Bot API =================
+class FakeBotApi:
+    def __init__(self):
+        self.updates = []
+        self.next_update_id = 1
+        self.next_message_id = 1
+        self.new_updates = None
+        self.waiters = {}  # chat_id -> Future (botun növbəti cavabı)
+        self.connections = set()  # açıq bağlantı handler task-ları (bağlanış üçün)
+        self.method_counts = {}
+
+    def _message(self, chat_id, text, sender):
+        self.next_message_id += 1
+        return {
+            "message_id": self.next_message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": sender,
+            "text": text,
+        }
+
+    def push_update(self, chat_id, kind, value):
+        user = {"id": chat_id, "is_bot": False, "first_name": f"User{chat_id}"}
+        update = {"update_id": self.next_update_id}
+        self.next_update_id += 1
+        if kind == "callback":
+            update["callback_query"] = {
+                "id": str(update["update_id"]),
+                "from": user,
+                "chat_instance": str(chat_id),
+                "data": value,
+                "message": self._message(chat_id, "Seçim edin:", BOT_USER),
+            }
+        else:
+            msg = self._message(chat_id, value, user)
+            if value.startswith("/"):
+                msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(value.split()[0])}]
+            update["message"] = msg
+        fut = asyncio.get_running_loop().create_future()
+        self.waiters[chat_id] = fut
+        self.updates.append(update)
+        self.new_updates.set()
+        return fut
+
+    async def dispatch(self, method, params):
+        self.method_counts[method] = self.method_counts.get(method, 0) + 1
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            offset = int(params.get("offset") or 0)
+            self.updates = [u for u in self.updates if u["update_id"] >= offset]
+            if not self.updates:
+                self.new_updates.clear()
+                try:
+                    await asyncio.wait_for(self.new_updates.wait(), float(params.get("timeout") or 0))
+                except asyncio.TimeoutError:
+                    pass
+            limit = int(params.get("limit") or 100)
+            return self.updates[:limit]
+        if method in ("sendMessage", "editMessageText"):
+            chat_id = int(params.get("chat_id") or 0)
+            fut = self.waiters.pop(chat_id, None)
+            if fut is not None and not fut.done():
+                fut.set_result(params.get("text", ""))
+            return self._message(chat_id, params.get("text", ""), BOT_USER)
+        # answerCallbackQuery, deleteWebhook və s.
+        return True
+
+    async def handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, target, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = line.decode().partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                if headers.get("content-type", "").startswith("application/json"):
+                    params = json.loads(body or b"{}")
+                else:
+                    params = dict(parse_qsl(body.decode()))
+                method = target.rstrip("/").rsplit("/", 1)[-1]
+
+                payload = json.dumps({"ok": True, "result": await self.dispatch(method, params)}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(payload)).encode() + b"\r\n\r\n" + payload
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # shutdown() tərəfindən; task-ı normal bitiririk ki, asyncio streams xəta loglamasın
+            pass
+        finally:
+            self.connections.discard(task)
+            writer.close()
+
+    async def shutdown(self, server):
+        """Serveri bağlayır və açıq qalan bağlantı handler-lərini dayandırır."""
+        server.close()
+        tasks = list(self.connections)
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await server.wait_closed()
+
+# ================= Trafik =================
+async def run_user(api, idx, scenario, stats, sem, step_timeout):
+    chat_id = USER_ID_BASE + idx
+    async with sem:
+        for kind, value in SCENARIOS[scenario]:
+            if value == "phone":
+                label, value = "number", "050%07d" % idx
+            elif value == "code":
+                label, value = "code", USER_CODE
+            else:
+                label = value if kind == "text" else f"cb:{value}"
+            t0 = time.perf_counter()
+            try:
+                reply = await asyncio.wait_for(api.push_update(chat_id, kind, value), step_timeout)
+            except asyncio.TimeoutError:
+                stats["timeouts"] += 1
+                api.waiters.pop(chat_id, None)
+                return
+            if reply == bot.ERROR_REPLY:
+                # Handler xəta verdi (məs. "database is locked") — gecikmə nümunəsi deyil
+                stats["failures"][label] = stats["failures"].get(label, 0) + 1
+                return
+            stats["latencies"].setdefault(label, []).append(time.perf_counter() - t0)
+
+async def run_traffic(api, port_holder, ready, args):
+    api.new_updates = asyncio.Event()
+    server = await asyncio.start_server(api.handle, "127.0.0.1", args.port)
+    port_holder.append(server.sockets[0].getsockname()[1])
+    ready.set()
+
+    # Bot polling-ə başlayana qədər gözlə
+    while not api.method_counts.get("getUpdates"):
+        await asyncio.sleep(0.05)
+
+    names, weights = zip(*args.mix.items())
+    rnd = random.Random(args.seed)
+    stats = {"latencies": {}, "failures": {}, "timeouts": 0}
+    sem = asyncio.Semaphore(args.concurrency or args.users)
+    tasks = []
+    t_start = time.perf_counter()
+    for i in range(args.users):
+        scenario = rnd.choices(names, weights)[0]
+        tasks.append(asyncio.create_task(run_user(api, i, scenario, stats, sem, args.step_timeout)))
+        if args.ramp:
+            await asyncio.sleep(args.ramp / args.users)
+    await asyncio.gather(*tasks)
+    stats["elapsed"] = time.perf_counter() - t_start
+    return server, stats
+
+def report(stats, api):
+    all_lat = sorted(x for v in stats["latencies"].values() for x in v)
+    failures = stats["failures"]
+    elapsed = stats["elapsed"]
+    lines = [
+        f"Elapsed: {elapsed:.2f}s",
+        f"Steps completed: {len(all_lat)}, failed (error reply): {sum(failures.values())}, timeouts: {stats['timeouts']}",
+        f"Throughput: {len(all_lat) / elapsed if elapsed else 0:.1f} steps/s",
+        "",
+        f"{'step':<20}{'n':>7}{'fail':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}",
+    ]
+
+    def row(label, vals, failed):
+        return (f"{label:<20}{len(vals):>7}{failed:>7}{percentile(vals, 50) * 1000:>10.1f}{percentile(vals, 95) * 1000:>10.1f}"
+                f"{percentile(vals, 99) * 1000:>10.1f}{(vals[-1] if vals else 0) * 1000:>10.1f}")
+
+    for label in dict.fromkeys(list(stats["latencies"]) + list(failures)):
+        lines.append(row(label, sorted(stats["latencies"].get(label, [])), failures.get(label, 0)))
+    lines.append(row("ALL", all_lat, sum(failures.values())))
+
+    reads, writes = sorted(DB_STATS.reads), sorted(DB_STATS.writes)
+    lines += [
+        "",
+        "DB (bot tərəfi):",
+        f"  reads: {len(reads)}, p95 {percentile(reads, 95) * 1000:.2f} ms, max {(reads[-1] if reads else 0) * 1000:.2f} ms",
+        f"  writes+commits: {len(writes)}, p95 {percentile(writes, 95) * 1000:.2f} ms, max {(writes[-1] if writes else 0) * 1000:.2f} ms",
+        f"  total time in DB: {(sum(reads) + sum(writes)):.2f}s",
+        f"  'database is locked' errors: {DB_STATS.locked_errors}",
+        "",
+        "API calls: " + ", ".join(f"{k}={v}" for k, v in sorted(api.method_counts.items())),
+    ]
+    print("\n".join(lines))
+
+def parse_mix(s):
+    mix = {}
+    for part in s.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Naməlum ssenari: {name} (mövcud: {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+def main():
+    ap = argparse.ArgumentParser(description="Bot üçün end-to-end yük testi (saxta Bot API ilə)")
+    ap.add_argument("--users", type=int, default=1000)
+    ap.add_argument("--mix", type=parse_mix, default=parse_mix("full=0.6,browse=0.3,login=0.1"))
+    ap.add_argument("--ramp", type=float, default=5.0, help="bütün istifadəçilərin qoşulma müddəti (s)")
+    ap.add_argument("--concurrency", type=int, default=0, help="eyni anda aktiv istifadəçi limiti (0 = limitsiz)")
+    ap.add_argument("--step-timeout", type=float, default=30.0)
+    ap.add_argument("--db-writers", type=int, default=0, help="paralel kənar DB yazıcılarının sayı")
+    ap.add_argument("--writer-hold", type=float, default=0.05, help="yazıcının kilidi saxlama müddəti (s)")
+    ap.add_argument("--schedule", default=None, help="schedule.xlsx və ya schedules/ qovluğu")
+    ap.add_argument("--port", type=int, default=0)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("bot").setLevel(logging.WARNING)
+
+    bot.load_schedule_from_xlsx(args.schedule)
+    group = next((l["group"] for l in bot.SCHEDULE_DATA.lessons), "IT-101")
+
+    tmpdir = tempfile.mkdtemp(prefix="bot-loadtest-")
+    db_path = os.path.join(tmpdir, "loadtest.db")
+    prepare_db(db_path, args.users, group)
+    instrument_db(db_path)
+
+    # Saxta API və trafik ayrıca thread-də, öz event loop-unda işləyir
+    api = FakeBotApi()
+    port_holder, ready, result = [], threading.Event(), {}
+    traffic_loop = asyncio.new_event_loop()
+
+    def traffic_thread():
+        asyncio.set_event_loop(traffic_loop)
+        result["server"], result["stats"] = traffic_loop.run_until_complete(
+            run_traffic(api, port_holder, ready, args))
+        traffic_loop.run_forever()  # bot dayanana qədər server cavab verməyə davam etsin
+        traffic_loop.close()
+
+    t = threading.Thread(target=traffic_thread, daemon=True)
+    t.start()
+    ready.wait()
+
+    stop_writers = threading.Event()
+    writers = [threading.Thread(target=db_writer, args=(db_path, args.users, args.writer_hold, stop_writers), daemon=True)
+               for _ in range(args.db_writers)]
+    for w in writers:
+        w.start()
+
+    application = bot.build_application(token=TOKEN, base_url=f"http://127.0.0.1:{port_holder[0]}/bot")
+
+    async def run_bot():
+        await application.initialize()
+        await application.updater.start_polling(poll_interval=0.0, timeout=1)
+        await application.start()
+        while "stats" not in result:
+            await asyncio.sleep(0.1)
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+
+    asyncio.run(run_bot())
+    stop_writers.set()
+    for w in writers:
+        w.join()
+    asyncio.run_coroutine_threadsafe(api.shutdown(result["server"]), traffic_loop).result()
+    traffic_loop.call_soon_threadsafe(traffic_loop.stop)
+    t.join()
+
+    report(result["stats"], api)
+    shutil.rmtree(tmpdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()